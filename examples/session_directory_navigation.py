@@ -2,14 +2,11 @@
 セッションを維持したままディレクトリ移動を行うサンプル
 """
 
+import asyncio
 import logging
-import os
-import sys
 
-# パスの追加（開発環境での実行用）
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
-from src.powershell_controller.simple import SimplePowerShellController
+from py_pshell.config import PowerShellControllerSettings
+from py_pshell.controller import PowerShellController
 
 
 def setup_logger() -> logging.Logger:
@@ -27,69 +24,68 @@ def setup_logger() -> logging.Logger:
     return logger
 
 
-def main() -> None:
+async def main() -> None:
     """メイン処理"""
     logger = setup_logger()
     logger.info("PowerShell 7を使用してセッションを維持したままディレクトリ移動を行います")
 
-    # コントローラーの初期化
-    controller = SimplePowerShellController()
-
     try:
-        # セッションを維持したままコマンドを順次実行
-        commands = [
-            # 現在のディレクトリを表示
-            "$PWD.Path",
-            # ディレクトリ移動（1回目）
-            "cd ..",
-            "$PWD.Path",
-            # ディレクトリ移動（2回目）
-            "cd ..",
-            "$PWD.Path",
-            # ディレクトリの内容を表示
-            "Get-ChildItem -Name",
-        ]
-
-        logger.info("コマンドの一括実行を開始")
-        results = controller.execute_commands_in_session(commands)
-
-        # 結果の表示
-        logger.info("----- 実行結果 -----")
-        for i, result in enumerate(results):
-            if i == 0:
-                logger.info(f"初期ディレクトリ: {result}")
-            elif i == 2:
-                logger.info(f"1階層上のディレクトリ: {result}")
-            elif i == 4:
-                logger.info(f"2階層上のディレクトリ: {result}")
-            elif i == 6:
-                logger.info(f"ディレクトリの内容:\n{result}")
-
-        # 別の方法: スクリプトファイルを使用
-        logger.info("\n----- 方法2: PowerShellスクリプト使用 -----")
-        ps_script = """
-        # 初期ディレクトリを記録
-        $initialDir = $PWD.Path
-        Write-Output "初期ディレクトリ: $initialDir"
-
-        # 1つ上のディレクトリに移動
-        cd ..
-        $dir1 = $PWD.Path
-        Write-Output "1階層上のディレクトリ: $dir1"
-
-        # さらに1つ上のディレクトリに移動
-        cd ..
-        $dir2 = $PWD.Path
-        Write-Output "2階層上のディレクトリ: $dir2"
-
-        # 現在のディレクトリの内容を表示
-        Write-Output "ディレクトリの内容:"
-        Get-ChildItem -Name
-        """
-
-        logger.info("PowerShellスクリプトを実行")
-        script_result = controller.execute_script(ps_script)
-        logger.info(f"スクリプト実行結果:\n{script_result}")
+        # コントローラーの初期化（セッションはブロックを抜けるまで維持される）
+        async with PowerShellController(settings=PowerShellControllerSettings()) as controller:
+            # セッションを維持したままコマンドを順次実行
+            commands = [
+                # 現在のディレクトリを表示
+                "$PWD.Path",
+                # ディレクトリ移動（1回目）
+                "cd ..",
+                "$PWD.Path",
+                # ディレクトリ移動（2回目）
+                "cd ..",
+                "$PWD.Path",
+                # ディレクトリの内容を表示
+                "Get-ChildItem -Name",
+            ]
+
+            logger.info("コマンドの一括実行を開始")
+            results = await controller.execute_commands_in_session(commands)
+
+            # 結果の表示
+            logger.info("----- 実行結果 -----")
+            for i, result in enumerate(results):
+                if i == 0:
+                    logger.info(f"初期ディレクトリ: {result}")
+                elif i == 2:
+                    logger.info(f"1階層上のディレクトリ: {result}")
+                elif i == 4:
+                    logger.info(f"2階層上のディレクトリ: {result}")
+                elif i == 6:
+                    logger.info(f"ディレクトリの内容:\n{result}")
+
+            # 別の方法: スクリプトファイルを使用
+            logger.info("\n----- 方法2: PowerShellスクリプト使用 -----")
+            ps_script = """
+            # 初期ディレクトリを記録
+            $initialDir = $PWD.Path
+            Write-Output "初期ディレクトリ: $initialDir"
+
+            # 1つ上のディレクトリに移動
+            cd ..
+            $dir1 = $PWD.Path
+            Write-Output "1階層上のディレクトリ: $dir1"
+
+            # さらに1つ上のディレクトリに移動
+            cd ..
+            $dir2 = $PWD.Path
+            Write-Output "2階層上のディレクトリ: $dir2"
+
+            # 現在のディレクトリの内容を表示
+            Write-Output "ディレクトリの内容:"
+            Get-ChildItem -Name
+            """
+
+            logger.info("PowerShellスクリプトを実行")
+            script_result = await controller.run_script(ps_script)
+            logger.info(f"スクリプト実行結果:\n{script_result.output}")
 
     except Exception as e:
         logger.error(f"エラーが発生しました: {e}")
@@ -98,4 +94,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
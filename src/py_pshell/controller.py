@@ -5,9 +5,8 @@ PowerShellコマンドの実行を制御するクラスを提供します。
 """
 
 import asyncio
-import json
 import types
-from typing import Any, TypeVar
+from typing import Any, Final, TypeVar
 
 from loguru import logger
 
@@ -22,10 +21,17 @@ from py_pshell.interfaces import (
     PowerShellControllerSettings,
     SessionProtocol,
 )
+from py_pshell.json_handler import JsonHandler
 from py_pshell.utils.command_executor import CommandExecutor
 
 T = TypeVar("T")
 
+# まとめて実行するコマンドの出力を区切るマーカー
+COMMAND_SEPARATOR: Final[str] = "__PS_COMMAND_SEPARATOR__"
+# 区切りマーカーを出力するコマンド
+# （入力がエコーされても誤検出しないよう、マーカーを分割して連結する）
+COMMAND_SEPARATOR_COMMAND: Final[str] = "Write-Output ('__PS_COMMAND' + '_SEPARATOR__')"
+
 
 class PowerShellController(PowerShellControllerProtocol):
     """PowerShellコントローラー
@@ -152,6 +158,46 @@ class PowerShellController(PowerShellControllerProtocol):
             logger.error(f"コマンドの実行に失敗しました: {e}")
             raise PowerShellExecutionError(f"コマンドの実行に失敗しました: {e}") from e
 
+    async def execute_commands_in_session(
+        self, commands: list[str], timeout: float | None = None
+    ) -> list[str]:
+        """複数のPowerShellコマンドを1回の呼び出しでまとめて実行します。
+
+        Args:
+            commands: 実行するコマンドのリスト
+            timeout: タイムアウト時間（秒）
+
+        Returns:
+            List[str]: コマンドごとの出力
+
+        Raises:
+            PowerShellExecutionError: コマンドの実行に失敗した場合
+        """
+        if not self._session:
+            raise PowerShellExecutionError("セッションが開始されていません")
+        if not commands:
+            return []
+
+        # コマンドの間に区切りマーカーの出力を挟み、1つのスクリプトとして送信する
+        script: str = f"; {COMMAND_SEPARATOR_COMMAND}; ".join(commands)
+        try:
+            output: str = await self._session.execute(script, timeout)
+        except Exception as e:
+            logger.error(f"コマンドの実行に失敗しました: {e}")
+            raise PowerShellExecutionError(f"コマンドの実行に失敗しました: {e}") from e
+
+        parts: list[str] = output.split(COMMAND_SEPARATOR)
+        if len(parts) != len(commands):
+            # 出力にマーカーが含まれていた、または途中で出力が途切れた
+            error_msg: str = (
+                f"出力をコマンドごとに分割できませんでした: "
+                f"{len(parts)}件（期待値: {len(commands)}件）"
+            )
+            logger.error(error_msg)
+            raise PowerShellExecutionError(error_msg)
+        logger.debug(f"{len(commands)}件のコマンドをまとめて実行しました")
+        return [part.strip() for part in parts]
+
     async def run_command(
         self, command: str, timeout: float | None = None
     ) -> CommandResultProtocol:
@@ -223,7 +269,7 @@ class PowerShellController(PowerShellControllerProtocol):
         try:
             result: str = await self._session.execute(command, timeout)
             logger.debug(f"JSONを取得しました: {command}")
-            return self._parse_json(result)
+            return self._parse_json(command, result)
         except Exception as e:
             logger.error(f"JSONの取得に失敗しました: {e}")
             raise PowerShellExecutionError(f"JSONの取得に失敗しました: {e}") from e
@@ -244,10 +290,11 @@ class PowerShellController(PowerShellControllerProtocol):
             logger.error(f"セッションの作成に失敗しました: {e}")
             raise PowerShellStartupError(f"セッションの作成に失敗しました: {e}") from e
 
-    def _parse_json(self, json_str: str) -> dict[str, Any]:
+    def _parse_json(self, command: str, json_str: str) -> dict[str, Any]:
         """JSON文字列をパースします。
 
         Args:
+            command: 実行されたコマンド
             json_str: パースするJSON文字列
 
         Returns:
@@ -257,11 +304,8 @@ class PowerShellController(PowerShellControllerProtocol):
             PowerShellExecutionError: JSONのパースに失敗した場合
         """
         try:
-            # 文字列の前後の空白を削除
-            json_str = json_str.strip()
-            # JSONをパース
-            result: dict[str, Any] = json.loads(json_str)
-            return result
+            # 文字列の前後の空白を削除してからJsonHandlerでパース
+            return JsonHandler.get_json(command, json_str.strip())
         except Exception as e:
             logger.error(f"JSONのパースに失敗しました: {e}")
             raise PowerShellExecutionError(f"JSONのパースに失敗しました: {e}") from e
@@ -98,6 +98,12 @@ class PowerShellControllerProtocol(Protocol):
         """コマンドを実行"""
         ...
 
+    async def execute_commands_in_session(
+        self, commands: list[str], timeout: float | None = None
+    ) -> list[str]:
+        """複数のコマンドをまとめて実行"""
+        ...
+
     async def run_command(
         self, command: str, timeout: float | None = None
     ) -> CommandResultProtocol:
@@ -5,8 +5,22 @@ PowerShellコマンドの結果をJSONとして処理する機能を提供しま
 """
 
 import json
+import re
+from collections.abc import Callable
 from typing import Any, cast
 
+try:
+    import orjson
+except ImportError:  # orjsonは任意の高速化依存
+    orjson = None  # type: ignore[assignment]
+
+# JSONのパース関数（orjsonが利用可能な場合はそちらを使用）
+# orjson.JSONDecodeErrorはjson.JSONDecodeErrorのサブクラスなので例外処理は共通
+_loads: Callable[[str], Any] = orjson.loads if orjson else json.loads
+
+# ConvertTo-Jsonの検出（PowerShellのコマンドレット名は大文字小文字を区別しない）
+_CTJ_RE = re.compile(r"ConvertTo-Json", re.IGNORECASE)
+
 
 class JsonHandler:
     """
@@ -31,7 +45,7 @@ class JsonHandler:
             ValueError: JSONの解析に失敗した場合
         """
         try:
-            return json.loads(output)
+            return _loads(output)
         except json.JSONDecodeError as e:
             raise ValueError(f"JSONの解析に失敗しました: {e}\n元データ: {output}") from e
 
@@ -46,9 +60,9 @@ class JsonHandler:
         Returns:
             str: ConvertTo-Jsonを追加したコマンド
         """
-        if "ConvertTo-Json" not in command:
-            return f"{command} | ConvertTo-Json -Depth 10"
-        return command
+        if _CTJ_RE.search(command):
+            return command
+        return f"{command} | ConvertTo-Json -Depth 10"
 
     @staticmethod
     def parse_json(command: str, output: str) -> dict[str, Any]:
@@ -66,7 +80,7 @@ class JsonHandler:
             ValueError: JSONの解析に失敗した場合
         """
         try:
-            result = json.loads(output)
+            result = _loads(output)
             if not isinstance(result, dict):
                 raise ValueError(f"JSONの解析結果が辞書ではありません: {result}")
             return cast(dict[str, Any], result)
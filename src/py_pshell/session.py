@@ -5,6 +5,7 @@ PowerShellとの接続セッションを管理するためのクラスを提供
 """
 
 import types
+from typing import Final
 
 from loguru import logger
 
@@ -13,6 +14,21 @@ from .errors import PowerShellShutdownError, PowerShellStartupError
 from .process_manager import ProcessManager
 from .stream_handler import StreamHandler
 
+# 初期化直後に存在する変数の名前を記録するコマンド
+# （自動変数や設定変数、$OutputEncodingなどはリセット時に削除しない）
+BASELINE_VARIABLES_COMMAND: Final[str] = (
+    "$global:__PSBaselineVariables = "
+    "@(Get-Variable -Scope Global | ForEach-Object Name) + '__PSBaselineVariables'"
+)
+# セッションの状態をリセットするコマンド
+# （エラー履歴を消去し、初期化後に追加された変数だけを削除する）
+RESET_STATE_COMMAND: Final[str] = (
+    "$Error.Clear(); "
+    "@(Get-Variable -Scope Global) | "
+    "Where-Object { $global:__PSBaselineVariables -notcontains $_.Name } | "
+    "ForEach-Object { Remove-Variable -Name $_.Name -Scope Global -ErrorAction SilentlyContinue }"
+)
+
 
 class PowerShellSession:
     """
@@ -73,6 +89,7 @@ class PowerShellSession:
             reader, writer = await self._process_manager.start()
             self._stream_handler.set_streams(reader, writer)
             await self._stream_handler.initialize()
+            await self._stream_handler.execute_command(BASELINE_VARIABLES_COMMAND)
             self._is_running = True
             logger.info("PowerShellセッションが開始されました")
         except Exception as e:
@@ -114,3 +131,15 @@ class PowerShellSession:
             CommunicationError: PowerShellとの通信に失敗した場合
         """
         return await self._stream_handler.execute_command(command, timeout)
+
+    async def reset_state(self) -> None:
+        """
+        プロセスを再起動せずにセッションの状態をリセットします。
+
+        エラー履歴と、セッション開始後に追加された変数を削除します。
+
+        Raises:
+            PowerShellExecutionError: コマンドの実行に失敗した場合
+        """
+        await self.execute(RESET_STATE_COMMAND)
+        logger.debug("PowerShellセッションの状態をリセットしました")
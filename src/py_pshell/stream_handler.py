@@ -5,13 +5,48 @@ PowerShellプロセスとの入出力ストリームを管理する機能を提
 """
 
 import asyncio
+import functools
 from typing import Final
 
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from .config import PowerShellControllerSettings
-from .errors import PowerShellExecutionError, PowerShellStreamError
+from .errors import PowerShellExecutionError, PowerShellStreamError, PowerShellTimeoutError
+
+# コマンド出力の終了を示すマーカー
+OUTPUT_END_MARKER: Final[str] = "__PS_OUTPUT_END__"
+# マーカーを出力するコマンド
+# （入力がエコーされても誤検出しないよう、マーカーを分割して連結する）
+OUTPUT_END_COMMAND: Final[str] = "Write-Output ('__PS_OUTPUT' + '_END__')"
+# コマンドの成功/失敗を示すマーカー
+COMMAND_ERROR_MARKER: Final[str] = "COMMAND_ERROR"
+COMMAND_SUCCESS_MARKER: Final[str] = "COMMAND_SUCCESS"
+
+# 1回の読み取りで返す出力の最大サイズ
+MAX_OUTPUT_SIZE: Final[int] = 1024 * 1024  # 1MB
+# ストリームから1回に読み取るサイズ
+READ_CHUNK_SIZE: Final[int] = 64 * 1024  # 64KB
+
+# セッション開始時に送信する入出力エンコーディングの初期化スクリプト
+ENCODING_INIT_SCRIPT: Final[str] = (
+    "$OutputEncoding = [System.Text.Encoding]::UTF8\n"
+    "[Console]::OutputEncoding = [System.Text.Encoding]::UTF8\n"
+    "[Console]::InputEncoding = [System.Text.Encoding]::UTF8\n"
+)
+
+
+@functools.cache
+def _encode_init_script(encoding: str) -> bytes:
+    """初期化スクリプトをエンコードします（エンコーディングごとに1回だけ行う）。
+
+    Args:
+        encoding: 文字エンコーディング
+
+    Returns:
+        bytes: エンコードされた初期化スクリプト
+    """
+    return ENCODING_INIT_SCRIPT.encode(encoding)
 
 
 class StreamHandler:
@@ -31,6 +66,10 @@ class StreamHandler:
         self.settings: PowerShellControllerSettings = settings
         self._reader: asyncio.StreamReader | None = None
         self._writer: asyncio.StreamWriter | None = None
+        # 読み取り済みで、まだ返していない出力
+        self._buffer: bytearray = bytearray()
+        # タイムアウトなどで読み切れず、次の読み取りで読み飛ばす出力の数
+        self._pending_outputs: int = 0
         logger.debug("StreamHandlerが初期化されました")
 
     def set_streams(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
@@ -43,6 +82,8 @@ class StreamHandler:
         """
         self._reader = reader
         self._writer = writer
+        self._buffer.clear()
+        self._pending_outputs = 0
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True
@@ -58,18 +99,11 @@ class StreamHandler:
             if not self._writer:
                 raise PowerShellStreamError("ストリームが初期化されていません")
 
-            init_script: Final[str] = (
-                "$OutputEncoding = [System.Text.Encoding]::UTF8\n"
-                "[Console]::OutputEncoding = [System.Text.Encoding]::UTF8\n"
-                "[Console]::InputEncoding = [System.Text.Encoding]::UTF8\n"
-            )
-
-            encoded_script: bytes = init_script.encode(self.settings.encoding)
-            self._writer.write(encoded_script)
+            self._writer.write(_encode_init_script(self.settings.encoding))
             await asyncio.wait_for(self._writer.drain(), timeout=5.0)
             logger.debug("初期化スクリプトを送信しました")
 
-        except TimeoutError as e:
+        except asyncio.TimeoutError as e:
             logger.error("初期化スクリプトの送信がタイムアウトしました")
             raise PowerShellStreamError("初期化スクリプトの送信がタイムアウトしました") from e
         except Exception as e:
@@ -93,24 +127,28 @@ class StreamHandler:
             if not self._writer:
                 raise PowerShellStreamError("ストリームが初期化されていません")
 
-            encoded_command: bytes = f"{command}\n".encode(self.settings.encoding)
+            # コマンドの後に終了マーカーを出力させ、読み取りの終了を検出できるようにする
+            encoded_command: bytes = f"{command}\n{OUTPUT_END_COMMAND}\n".encode(
+                self.settings.encoding
+            )
             self._writer.write(encoded_command)
             await asyncio.wait_for(self._writer.drain(), timeout=5.0)
 
-        except TimeoutError as e:
+        except asyncio.TimeoutError as e:
             logger.error("コマンドの送信がタイムアウトしました")
             raise PowerShellStreamError("コマンドの送信がタイムアウトしました") from e
         except Exception as e:
             logger.error(f"コマンドの送信に失敗: {e}")
             raise PowerShellStreamError(f"コマンドの送信に失敗しました: {e}") from e
 
-    @retry(
-        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True
-    )
     async def read_output(self, timeout: float | None = None) -> str:
         """
         出力を読み取ります。
 
+        以前の読み取りがタイムアウトした場合は、遅れて届いたその出力を
+        終了マーカーまで読み飛ばしてから、今回の出力を読み取ります。
+        ストリームから取り出した出力は読み直せないため、送信と異なり再試行しません。
+
         Args:
             timeout: タイムアウト時間（秒）
 
@@ -118,37 +156,95 @@ class StreamHandler:
             str: 読み取った出力
 
         Raises:
+            PowerShellTimeoutError: 出力の読み取りがタイムアウトした場合
             PowerShellStreamError: 出力の読み取りに失敗した場合
         """
         try:
             if not self._reader:
                 raise PowerShellStreamError("ストリームが初期化されていません")
 
-            output: bytearray = bytearray()
-            effective_timeout: float = timeout or self.settings.timeout
-            max_size: int = 1024 * 1024  # 1MB
-            chunk_size: int = 4096  # 4KB
+            effective_timeout: float = timeout or self.settings.timeout_settings.default
+            end_marker: bytes = OUTPUT_END_MARKER.encode(self.settings.encoding)
 
             try:
-                while True:
-                    chunk: bytes = await asyncio.wait_for(
-                        self._reader.read(chunk_size), timeout=effective_timeout
-                    )
-                    if not chunk:
-                        break
-                    output.extend(chunk)
-                    if len(output) > max_size:
-                        break
-            except TimeoutError:
-                pass  # タイムアウトは正常な終了条件として扱う
-
-            decoded_output: str = output.decode(self.settings.encoding)
+                output: bytes = await asyncio.wait_for(
+                    self._read_current_output(self._reader, end_marker), timeout=effective_timeout
+                )
+            except asyncio.TimeoutError as e:
+                # 今回の出力は後から届くため、次の読み取りで読み飛ばす
+                self._pending_outputs += 1
+                logger.error(f"出力の読み取りがタイムアウトしました（{effective_timeout}秒）")
+                raise PowerShellTimeoutError(
+                    "出力の読み取りがタイムアウトしました", "read_output", effective_timeout
+                ) from e
+
+            # デコードできないバイト（ネイティブコマンドの別エンコーディングの出力や、
+            # 最大サイズでの打ち切りで分割された文字）は置換文字にする
+            decoded_output: str = output.decode(self.settings.encoding, errors="replace")
             return decoded_output
 
+        except PowerShellTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"出力の読み取りに失敗: {e}")
             raise PowerShellStreamError(f"出力の読み取りに失敗しました: {e}") from e
 
+    async def _read_current_output(self, reader: asyncio.StreamReader, end_marker: bytes) -> bytes:
+        """
+        読み切れなかった以前の出力を読み飛ばし、今回の出力を読み取ります。
+
+        Args:
+            reader: 標準出力のストリーム
+            end_marker: エンコードされた終了マーカー
+
+        Returns:
+            bytes: 今回の出力（終了マーカーより前の部分）
+        """
+        while self._pending_outputs:
+            await self._read_until_marker(reader, end_marker)
+            # 読み飛ばしが完了してから減らす（途中でタイムアウトしても次回に持ち越す）
+            self._pending_outputs -= 1
+        return await self._read_until_marker(reader, end_marker)
+
+    async def _read_until_marker(self, reader: asyncio.StreamReader, end_marker: bytes) -> bytes:
+        """
+        終了マーカーまで読み取り、マーカーより前の部分を返します。
+
+        マーカーより後に読み取ったデータは次の読み取りのためにバッファに残します。
+        出力が最大サイズを超えた場合はそこで打ち切り、残りは次の読み取りで読み飛ばします。
+
+        Args:
+            reader: 標準出力のストリーム
+            end_marker: エンコードされた終了マーカー
+
+        Returns:
+            bytes: 終了マーカーより前の出力
+        """
+        search_start: int = 0
+        while True:
+            marker_pos: int = self._buffer.find(end_marker, search_start)
+            if marker_pos != -1:
+                output: bytes = bytes(self._buffer[:marker_pos])
+                del self._buffer[: marker_pos + len(end_marker)]
+                return output
+            if len(self._buffer) > MAX_OUTPUT_SIZE:
+                # マーカーの一部かもしれない末尾は残して打ち切る
+                keep_from: int = len(self._buffer) - len(end_marker) + 1
+                output = bytes(self._buffer[:keep_from])
+                del self._buffer[:keep_from]
+                self._pending_outputs += 1
+                return output
+
+            # チャンクの境界をまたぐマーカーも検出できるよう、少し手前から探す
+            search_start = max(len(self._buffer) - len(end_marker) + 1, 0)
+            chunk: bytes = await reader.read(READ_CHUNK_SIZE)
+            if not chunk:
+                # ストリームの終了
+                output = bytes(self._buffer)
+                self._buffer.clear()
+                return output
+            self._buffer.extend(chunk)
+
     async def initialize(self) -> None:
         """
         ストリームを初期化します。
@@ -183,6 +279,7 @@ class StreamHandler:
             str: コマンドの実行結果
 
         Raises:
+            PowerShellTimeoutError: コマンドの実行がタイムアウトした場合
             PowerShellStreamError: ストリームの操作に失敗した場合
             PowerShellExecutionError: コマンドの実行に失敗した場合
         """
@@ -190,28 +287,26 @@ class StreamHandler:
             await self.send_command(command)
             output: str = await self.read_output(timeout)
 
-            error_marker: str = "COMMAND_ERROR"
-            success_marker: str = "COMMAND_SUCCESS"
-
-            # 出力から成功/失敗を判定
-            if error_marker in output:
-                split_result: list[str] = output.split(error_marker)
-                error_msg: str = split_result[0].strip()
+            # 出力から成功/失敗を判定（マーカーより前の部分だけを切り出す）
+            error_pos: int = output.find(COMMAND_ERROR_MARKER)
+            if error_pos != -1:
+                error_msg: str = output[:error_pos].strip()
                 raise PowerShellExecutionError(
                     f"コマンドの実行に失敗しました: {error_msg}", command
                 )
 
             # 成功メッセージを除去
-            split_result: list[str] = output.split(success_marker)
-            result: str = split_result[0].strip()
-            return result
+            success_pos: int = output.find(COMMAND_SUCCESS_MARKER)
+            if success_pos != -1:
+                output = output[:success_pos]
+            return output.strip()
 
         except PowerShellStreamError as e:
             error_msg: str = str(e)
             raise PowerShellExecutionError(
                 f"コマンドの実行に失敗しました: {error_msg}", command
             ) from e
-        except PowerShellExecutionError:
+        except (PowerShellExecutionError, PowerShellTimeoutError):
             raise
         except Exception as e:
             error_msg: str = str(e)
@@ -4,6 +4,7 @@
 PowerShellコントローラーで使用するユーティリティを提供します。
 """
 
+import functools
 import os
 import platform
 import tempfile
@@ -18,10 +19,13 @@ __all__ = [
 ]
 
 
+@functools.cache
 def get_powershell_executable() -> str:
     """
     環境に応じたPowerShell実行ファイルのパスを返します。
 
+    ファイルの存在確認は初回呼び出し時にのみ行い、結果をキャッシュします。
+
     Returns:
         str: PowerShell実行ファイルのパス
     """
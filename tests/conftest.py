@@ -5,14 +5,20 @@ PowerShellテスト用の共通フィクスチャ
 import asyncio
 import os
 import re
+import shutil
 import sys
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Callable
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 import pytest_asyncio
 from loguru import logger
 
+try:
+    import uvloop
+except ImportError:  # uvloopはWindowsでは利用できない
+    uvloop = None
+
 from py_pshell.config import PowerShellControllerSettings, PowerShellTimeoutSettings
 from py_pshell.controller import PowerShellController
 from py_pshell.errors import (
@@ -30,17 +36,36 @@ IS_CI = "CI" in os.environ
 USE_MOCK = os.environ.get("POWERSHELL_TEST_MOCK", "true").lower() == "true"
 
 
-@pytest.fixture(scope="session")
-def event_loop_policy():
-    """イベントループポリシーを設定するフィクスチャ"""
+def pytest_configure(config):
+    """テスト用のモック設定を行う
+
+    xdistの各ワーカーでもテストモジュールのインポート前に設定されます。
+    """
+    os.environ["POWERSHELL_TEST_MOCK"] = "true"
+
+
+def pytest_asyncio_loop_factories(config, item):
+    """非同期テストで使用するイベントループを指定する"""
+    if uvloop is not None:
+        # uvloopが利用可能な場合は高速なuvloopを使用
+        return {"uvloop": uvloop.new_event_loop}
     if IS_WINDOWS:
         # Windowsの場合、ProactorEventLoopを使用
-        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-    return asyncio.get_event_loop_policy()
+        return {"proactor": asyncio.ProactorEventLoop}
+    return {"asyncio": asyncio.new_event_loop}
 
 
-@pytest.fixture
-def session_config() -> PowerShellControllerSettings:
+@pytest.fixture(scope="session")
+def powershell_path() -> str | None:
+    """インストールされているPowerShellのパスを提供します。
+
+    PATH上の探索はテストセッション全体で1回だけ行い、見つからない場合はNoneを返します。
+    """
+    return shutil.which("pwsh") or shutil.which("powershell")
+
+
+@pytest.fixture(scope="session")
+def session_config(powershell_path: str | None) -> PowerShellControllerSettings:
     """テスト用のPowerShellセッション設定を提供します。"""
     # デフォルト設定を使用するが、タイムアウトは短くしてテストを高速化
     timeout_settings = PowerShellTimeoutSettings(
@@ -50,8 +75,8 @@ def session_config() -> PowerShellControllerSettings:
     )
 
     settings = PowerShellControllerSettings(
-        powershell_executable="powershell" if IS_WINDOWS else "pwsh",
-        timeout=timeout_settings,
+        powershell_path=powershell_path or ("powershell" if IS_WINDOWS else "pwsh"),
+        timeout_settings=timeout_settings,
         encoding="utf-8",
         use_custom_host=True,
         debug=True,
@@ -60,24 +85,26 @@ def session_config() -> PowerShellControllerSettings:
     # CIモードでの設定調整
     if IS_CI:
         # CI環境ではさらにタイムアウトを長めに設定（不安定性に対処）
-        settings.timeout.startup = 10.0
-        settings.timeout.shutdown = 5.0
-        settings.timeout.default = 5.0
+        settings.timeout_settings.startup = 10.0
+        settings.timeout_settings.shutdown = 5.0
+        settings.timeout_settings.default = 5.0
 
     return settings
 
 
 @pytest_asyncio.fixture
 async def session(
-    session_config: PowerShellControllerSettings,
+    session_config: PowerShellControllerSettings, powershell_path: str | None
 ) -> AsyncGenerator[PowerShellSession, None]:
     """実際のPowerShellセッションを提供します。
 
     このフィクスチャはリアルなPowerShellセッションを作成します。
     mock_sessionでモック化されたセッションを使用する場合は、このフィクスチャを使用しないでください。
     """
-    if USE_MOCK:
+    if _should_mock_sessions():
         pytest.skip("モック使用が有効なため、実際のセッションを使用するテストをスキップします")
+    if powershell_path is None:
+        pytest.skip("PowerShellがインストールされていないため、テストをスキップします")
 
     session = PowerShellSession(settings=session_config)
     await session.__aenter__()
@@ -122,10 +149,10 @@ async def async_mock_execute(command: str) -> str:
 
 # コントローラーの設定
 @pytest.fixture
-def controller_config():
+def controller_config(session_config: PowerShellControllerSettings):
     """テスト用のコントローラー設定を提供します。"""
     # セッション設定と同じものを使用
-    return session_config()
+    return session_config
 
 
 # モック化されたセッション
@@ -143,15 +170,99 @@ async def mock_session() -> AsyncGenerator[AsyncMock, None]:
     yield session
 
 
-@pytest.fixture
-def use_mock_sessions(monkeypatch):
-    """テスト全体でPowerShellSessionをモック化する"""
+def _should_mock_sessions() -> bool:
+    """PowerShellSessionをモック化するかどうかを判定する"""
     # ユーザー指定のモック設定があれば、それを尊重
     if not USE_MOCK and "POWERSHELL_TEST_MOCK" not in os.environ:
         logger.info("モックを使用せずに実際のテストを実行します")
-        return
+        return False
+    return True
+
 
-    # モック化する
+@pytest.fixture(scope="session")
+def session_patcher() -> Callable[[pytest.MonkeyPatch], None] | None:
+    """PowerShellSessionをモック化する関数を提供します。
+
+    モックを使用しない場合はNoneを返します。
+    """
+    return _patch_sessions if _should_mock_sessions() else None
+
+
+@pytest.fixture
+def use_mock_sessions(monkeypatch, session_patcher):
+    """テスト全体でPowerShellSessionをモック化する"""
+    if session_patcher:
+        session_patcher(monkeypatch)
+
+
+# モックのコマンド分類
+# 各分岐を先頭位置の先読みにすることで、if/elifと同じ優先順位で1回の照合で分類する
+_MOCK_COMMAND_RE = re.compile(
+    r"^(?=.*?(?P<output>Write-Output))"
+    r"|^(?=.*?(?P<not_found>Get-NonExistentCommand|Get-NonExistentCmdlet))"
+    r"|^(?=.*?(?P<sleep>Start-Sleep))"
+    r"|^(?=.*?(?P<json>(?i:json)))"
+    r"|^(?=.*?(?P<connection_failed>Test-ConnectionFailed))"
+    r"|^(?=.*?(?P<process_failed>Test-ProcessFailed))",
+    re.DOTALL,
+)
+_WRITE_OUTPUT_RE = re.compile(r"Write-Output\s+(?:'([^']*)'|\"([^\"]*)\")")
+
+
+def _mock_output(command: str) -> str:
+    """出力コマンドの場合、引用符内のテキストを抽出"""
+    match = _WRITE_OUTPUT_RE.search(command)
+    if match:
+        return match.group(1) if match.group(1) is not None else match.group(2)
+    return "Output"
+
+
+def _mock_not_found(command: str) -> str:
+    """存在しないコマンドの場合、例外を発生"""
+    raise PowerShellExecutionError(
+        "CommandNotFound: The term 'Get-NonExistentCommand' is not recognized.", command
+    )
+
+
+def _mock_sleep(command: str) -> str:
+    """スリープコマンドの場合、タイムアウト例外を発生"""
+    if "-Seconds 5" in command:
+        raise PowerShellTimeoutError("Operation timed out")
+    # 短いスリープは普通に成功
+    return "Sleep completed"
+
+
+def _mock_json(command: str) -> str:
+    """JSON関連のコマンド"""
+    if "PSCustomObject" in command:
+        return '{"Name":"Test","Value":123}'
+    elif "[1, 2, 3]" in command:
+        return "[1,2,3]"
+    return "{}"
+
+
+def _mock_connection_failed(command: str) -> str:
+    """通信エラーのテスト"""
+    raise CommunicationError("通信エラーが発生しました")
+
+
+def _mock_process_failed(command: str) -> str:
+    """プロセスエラーのテスト"""
+    raise ProcessError("プロセスエラーが発生しました")
+
+
+_MOCK_HANDLERS: dict[str, Callable[[str], str]] = {
+    "output": _mock_output,
+    "not_found": _mock_not_found,
+    "sleep": _mock_sleep,
+    "json": _mock_json,
+    "connection_failed": _mock_connection_failed,
+    "process_failed": _mock_process_failed,
+}
+
+
+def _patch_sessions(monkeypatch: pytest.MonkeyPatch) -> None:
+    """PowerShellSessionとPowerShellControllerをモック化する"""
     logger.info("PowerShellセッションをモック化します")
 
     # PowerShellSessionの__aenter__をパッチ
@@ -162,43 +273,12 @@ def use_mock_sessions(monkeypatch):
         return self
 
     # executeメソッドをパッチ
-    async def mock_execute(self, command: str) -> str:
-        if "Write-Output" in command:
-            # 出力コマンドの場合、引用符内のテキストを抽出
-            match = re.search(r"Write-Output\s+'([^']*)'", command)
-            if match:
-                return match.group(1)
-            match = re.search(r"Write-Output\s+\"([^\"]*)\"", command)
-            if match:
-                return match.group(1)
-            return "Output"
-        elif "Get-NonExistentCommand" in command or "Get-NonExistentCmdlet" in command:
-            # 存在しないコマンドの場合、例外を発生
-            raise PowerShellExecutionError(
-                "CommandNotFound: The term 'Get-NonExistentCommand' is not recognized.", command
-            )
-        elif "Start-Sleep" in command:
-            # スリープコマンドの場合、タイムアウト例外を発生
-            if "-Seconds 5" in command:
-                raise PowerShellTimeoutError("Operation timed out")
-            # 短いスリープは普通に成功
-            return "Sleep completed"
-        elif "ConvertTo-Json" in command or "JSON" in command.upper():
-            # JSON関連のコマンド
-            if "PSCustomObject" in command:
-                return '{"Name":"Test","Value":123}'
-            elif "[1, 2, 3]" in command:
-                return "[1,2,3]"
-            return "{}"
-        elif "Test-ConnectionFailed" in command:
-            # 通信エラーのテスト
-            raise CommunicationError("通信エラーが発生しました")
-        elif "Test-ProcessFailed" in command:
-            # プロセスエラーのテスト
-            raise ProcessError("プロセスエラーが発生しました")
-        else:
+    async def mock_execute(self, command: str, timeout: float | None = None) -> str:
+        match = _MOCK_COMMAND_RE.match(command)
+        if match is None:
             # その他のコマンドはただ成功
             return "Command executed successfully"
+        return _MOCK_HANDLERS[match.lastgroup](command)
 
     # PowerShellSessionのモック
     monkeypatch.setattr(PowerShellSession, "__aenter__", mock_aenter)
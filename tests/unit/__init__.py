@@ -1,8 +1,3 @@
 """
 PowerShellコントローラーのテストパッケージ
 """
-
-import os
-
-# テスト用のモック設定
-os.environ["POWERSHELL_TEST_MOCK"] = "true"
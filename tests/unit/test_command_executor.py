@@ -10,6 +10,7 @@ import pytest
 
 from py_pshell.command_executor import CommandExecutor
 from py_pshell.errors import PowerShellError, PowerShellExecutionError
+from py_pshell.interfaces import SessionProtocol
 
 
 class TestCommandExecutor:
@@ -18,15 +19,31 @@ class TestCommandExecutor:
     @pytest.fixture
     def mock_session(self):
         """モックセッションを作成するフィクスチャ"""
-        session = AsyncMock()
+        # 使用する属性だけを持つようにプロトコルをspecとして指定
+        session = AsyncMock(spec=SessionProtocol)
         # 標準的な実行パターンを定義
         session.execute.return_value = "成功"
         return session
 
+    @pytest.fixture
+    def executor(self, mock_session):
+        """テスト用のCommandExecutor"""
+        return CommandExecutor(mock_session)
+
+    @pytest.fixture
+    def new_loop_patches(self):
+        """実行中のループがない状態で新しいループを作成させるパッチ"""
+        mock_loop = MagicMock()
+        mock_loop.is_closed.return_value = False
+
+        with patch("asyncio.get_running_loop", side_effect=RuntimeError), patch(
+            "asyncio.new_event_loop", return_value=mock_loop
+        ), patch("threading.Thread") as mock_thread:
+            yield mock_loop, mock_thread
+
     @pytest.mark.asyncio
-    async def test_run_command_success(self, mock_session):
+    async def test_run_command_success(self, executor, mock_session):
         """コマンド実行の成功テスト"""
-        executor = CommandExecutor(mock_session)
         command = "Get-Process"
         mock_session.execute.return_value = "process1\nprocess2"
 
@@ -42,9 +59,8 @@ class TestCommandExecutor:
         assert result.execution_time >= 0
 
     @pytest.mark.asyncio
-    async def test_run_command_powershell_error(self, mock_session):
+    async def test_run_command_powershell_error(self, executor, mock_session):
         """PowerShellエラー発生時のテスト"""
-        executor = CommandExecutor(mock_session)
         command = "Invalid-Command"
         error_message = "PowerShellエラーが発生しました"
         mock_session.execute.side_effect = PowerShellError(error_message)
@@ -59,9 +75,8 @@ class TestCommandExecutor:
         assert result.execution_time >= 0
 
     @pytest.mark.asyncio
-    async def test_run_command_generic_exception(self, mock_session):
+    async def test_run_command_generic_exception(self, executor, mock_session):
         """一般的な例外発生時のテスト"""
-        executor = CommandExecutor(mock_session)
         command = "Test-Command"
         mock_session.execute.side_effect = ValueError("一般的なエラーが発生しました")
 
@@ -75,9 +90,8 @@ class TestCommandExecutor:
         assert result.execution_time >= 0
 
     @pytest.mark.asyncio
-    async def test_run_script(self, mock_session):
+    async def test_run_script(self, executor, mock_session):
         """スクリプト実行のテスト"""
-        executor = CommandExecutor(mock_session)
         script = "$var = 1; Write-Output $var"
         mock_session.execute.return_value = "1"
 
@@ -89,9 +103,8 @@ class TestCommandExecutor:
         assert result.success is True
 
     @pytest.mark.asyncio
-    async def test_execute_command_success(self, mock_session):
+    async def test_execute_command_success(self, executor, mock_session):
         """execute_commandの成功テスト"""
-        executor = CommandExecutor(mock_session)
         command = "Get-Service"
         mock_session.execute.return_value = "service1\nservice2"
 
@@ -102,9 +115,8 @@ class TestCommandExecutor:
         mock_session.execute.assert_called_once_with(command, None)
 
     @pytest.mark.asyncio
-    async def test_execute_command_error(self, mock_session):
+    async def test_execute_command_error(self, executor, mock_session):
         """execute_commandのエラーテスト"""
-        executor = CommandExecutor(mock_session)
         command = "Invalid-Service"
         mock_session.execute.side_effect = Exception("エラーが発生しました")
 
@@ -113,9 +125,8 @@ class TestCommandExecutor:
             await executor.execute_command(command)
 
     @pytest.mark.asyncio
-    async def test_run_command_with_timeout(self, mock_session):
+    async def test_run_command_with_timeout(self, executor, mock_session):
         """タイムアウト指定のテスト"""
-        executor = CommandExecutor(mock_session)
         command = "Long-Command"
         timeout = 10.0
 
@@ -124,31 +135,21 @@ class TestCommandExecutor:
         # タイムアウトが正しく渡されたか
         mock_session.execute.assert_called_once_with(command, timeout)
 
-    def test_get_or_create_loop(self, mock_session):
+    def test_get_or_create_loop(self, executor, new_loop_patches):
         """イベントループ作成のテスト"""
-        # 実行中のループがない状態をモック
-        with patch("asyncio.get_running_loop", side_effect=RuntimeError), patch(
-            "threading.Thread"
-        ) as mock_thread:
-
-            # 新しいループを作成
-            mock_loop = MagicMock()
-            mock_loop.is_closed.return_value = False
-
-            with patch("asyncio.new_event_loop", return_value=mock_loop):
-                executor = CommandExecutor(mock_session)
+        mock_loop, mock_thread = new_loop_patches
 
-                # 初回呼び出し
-                loop1 = executor._get_or_create_loop()
+        # 初回呼び出し
+        loop1 = executor._get_or_create_loop()
 
-                # イベントループが作成されたか
-                assert loop1 == mock_loop
-                mock_thread.assert_called_once()
+        # イベントループが作成されたか
+        assert loop1 == mock_loop
+        mock_thread.assert_called_once()
 
-                # 2回目の呼び出し - 既存のループを再利用するはず
-                loop2 = executor._get_or_create_loop()
+        # 2回目の呼び出し - 既存のループを再利用するはず
+        loop2 = executor._get_or_create_loop()
 
-                # 同じループが返されるか
-                assert loop2 == mock_loop
-                # スレッドは1回だけ作成されるはず
-                assert mock_thread.call_count == 1
+        # 同じループが返されるか
+        assert loop2 == mock_loop
+        # スレッドは1回だけ作成されるはず
+        assert mock_thread.call_count == 1
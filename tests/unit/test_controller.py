@@ -4,70 +4,119 @@ PowerShellコントローラーのテストモジュール
 PowerShellコントローラーの機能をテストします。
 """
 
-from unittest.mock import AsyncMock, MagicMock, patch
+from collections.abc import Coroutine
+from typing import Any
+from unittest.mock import AsyncMock, patch
 
 import pytest
 import pytest_asyncio
 
-from py_pshell.controller import PowerShellController
-from py_pshell.errors import PowerShellShutdownError, PowerShellStartupError
+from py_pshell.controller import (
+    COMMAND_SEPARATOR,
+    COMMAND_SEPARATOR_COMMAND,
+    PowerShellController,
+)
+from py_pshell.errors import (
+    PowerShellExecutionError,
+    PowerShellShutdownError,
+    PowerShellStartupError,
+)
 from py_pshell.interfaces import CommandResultProtocol
+from py_pshell.session import PowerShellSession
 from py_pshell.utils.command_result import CommandResult
 
+# テスト間で共有するコマンド結果（テストからは変更しない）
+_TEMPLATE_RESULT = CommandResult(
+    output="Test Output", error="", success=True, command="Get-Process", execution_time=0.1
+)
+_JSON_STR = '{"name": "test", "value": 123}'
+_JSON_OBJ = {"name": "test", "value": 123}
+
+
+def _make_session_mock() -> AsyncMock:
+    """PowerShellセッションのモックを作成する"""
+    session = AsyncMock(spec_set=PowerShellSession)
+    session.execute.return_value = "Test Output"
+    return session
+
+
+class _StubLoop:
+    """close_syncのテストで使用する停止中のイベントループのスタブ"""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        self.calls = 0
+        self._error = error
+
+    def is_running(self) -> bool:
+        return False
+
+    def run_until_complete(self, coro: Coroutine[Any, Any, Any]) -> None:
+        self.calls += 1
+        # 実行しないコルーチンは閉じて未awaitの警告を防ぐ
+        coro.close()
+        if self._error is not None:
+            raise self._error
+
+
+@pytest.fixture(scope="session")
+def _controller_singleton():
+    """テストセッション全体で共有するコントローラーのフィクスチャ
+
+    コントローラーとモックの生成はセッションで1回だけ行い、
+    テストごとの状態は ``controller`` フィクスチャでリセットします。
+    """
+    controller = PowerShellController()
+    session = _make_session_mock()
+    command_executor = AsyncMock()
+    command_executor.run_command = AsyncMock()
+    command_executor.run_script = AsyncMock()
+    return controller, session, command_executor
+
 
 @pytest_asyncio.fixture
-async def controller():
+async def controller(_controller_singleton):
     """PowerShellコントローラーのフィクスチャ"""
-    controller = PowerShellController()
-    # モックの設定
-    controller._session = AsyncMock()
-    controller._session.execute = AsyncMock(return_value="Test Output")
-    controller._session.stop = AsyncMock()
-    controller._command_executor = AsyncMock()
-    controller._command_executor.run_command = AsyncMock(
-        return_value=CommandResult(
-            output="Test Output", error="", success=True, command="Get-Process", execution_time=0.1
-        )
-    )
+    controller, session, command_executor = _controller_singleton
+    # 前のテストで設定された戻り値・例外・呼び出し履歴をリセット
+    session.reset_mock(return_value=False, side_effect=True)
+    command_executor.reset_mock(return_value=False, side_effect=True)
+    session.execute.return_value = "Test Output"
+    command_executor.run_command.return_value = _TEMPLATE_RESULT
+    controller._session = session
+    controller._command_executor = command_executor
     await controller.start()
     yield controller
     await controller.close()
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_context_manager():
     """非同期コンテキストマネージャーのテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    execute_mock = AsyncMock(return_value="Test Output")
-    controller._session.execute = execute_mock
-    controller._session.stop = AsyncMock()
+    session = _make_session_mock()
+    controller._session = session
 
     async with controller as ctrl:
         assert isinstance(ctrl, PowerShellController)
         result = await ctrl.execute_command("Get-Process")
         assert isinstance(result, str)
         assert result == "Test Output"
-        execute_mock.assert_awaited_once_with("Get-Process", None)
+        session.execute.assert_awaited_once_with("Get-Process", None)
 
     # コンテキストマネージャーを抜けた後の状態を確認
     assert controller._session is None
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_start():
     """startメソッドのテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock()
+    controller._session = _make_session_mock()
     await controller.start()
     assert controller._session is not None
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_start_error():
     """startメソッドのエラーテスト"""
     controller = PowerShellController()
@@ -77,167 +126,136 @@ async def test_start_error():
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
-async def test_execute_command():
+async def test_execute_command(controller):
     """コマンド実行のテスト"""
-    controller = PowerShellController()
-    controller._session = AsyncMock()
-    execute_mock = AsyncMock(return_value="Test Output")
-    controller._session.execute = execute_mock
-    controller._session.stop = AsyncMock()
-    await controller.start()
-
-    try:
-        result = await controller.execute_command("Get-Process")
-        assert isinstance(result, str)
-        assert result == "Test Output"
-        execute_mock.assert_awaited_once_with("Get-Process", None)
-    finally:
-        await controller.close()
-        assert controller._session is None
+    result = await controller.execute_command("Get-Process")
+    assert isinstance(result, str)
+    assert result == "Test Output"
+    controller._session.execute.assert_awaited_once_with("Get-Process", None)
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
-async def test_run_command():
-    """run_commandのテスト"""
-    controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock()
-    controller._command_executor = AsyncMock()
-    controller._command_executor.run_command = AsyncMock(
-        return_value=CommandResult(
-            output="Test Output", error="", success=True, command="Get-Process", execution_time=0.1
-        )
+async def test_execute_commands_in_session(controller):
+    """複数コマンドの一括実行のテスト"""
+    controller._session.execute.return_value = (
+        f"First\n{COMMAND_SEPARATOR}\nSecond\n{COMMAND_SEPARATOR}\nThird\n"
     )
-    await controller.start()
 
-    try:
-        result = await controller.run_command("Get-Process")
-        assert isinstance(result, CommandResultProtocol)
-        assert result.success
-        assert result.output == "Test Output"
-        assert result.error == ""
-        assert result.command == "Get-Process"
-        assert result.execution_time > 0
-    finally:
-        await controller.close()
-        assert controller._session is None
+    commands = ["Write-Output 'First'", "Write-Output 'Second'", "Write-Output 'Third'"]
+    results = await controller.execute_commands_in_session(commands)
+    assert results == ["First", "Second", "Third"]
+    # PowerShellへの呼び出しは1回にまとめられる
+    controller._session.execute.assert_awaited_once_with(
+        f"Write-Output 'First'; {COMMAND_SEPARATOR_COMMAND}; "
+        f"Write-Output 'Second'; {COMMAND_SEPARATOR_COMMAND}; "
+        "Write-Output 'Third'",
+        None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_execute_commands_in_session_separator_mismatch(controller):
+    """出力の区切り数がコマンド数と一致しない場合のテスト"""
+    # 2件目の出力が途切れ、区切りマーカーが1つしか出力されなかった
+    controller._session.execute.return_value = f"First\n{COMMAND_SEPARATOR}\nSecond\n"
+
+    commands = ["Write-Output 'First'", "Write-Output 'Second'", "Write-Output 'Third'"]
+    with pytest.raises(PowerShellExecutionError, match="分割できませんでした"):
+        await controller.execute_commands_in_session(commands)
+
+
+@pytest.mark.asyncio
+async def test_run_command(controller):
+    """run_commandのテスト"""
+    result = await controller.run_command("Get-Process")
+    assert isinstance(result, CommandResultProtocol)
+    assert result.success
+    assert result.output == "Test Output"
+    assert result.error == ""
+    assert result.command == "Get-Process"
+    assert result.execution_time > 0
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
-async def test_run_script():
+async def test_run_script(controller):
     """run_scriptのテスト"""
-    controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock()
-    controller._command_executor = AsyncMock()
-    expected_result = CommandResult(
+    script = "Get-Process | Select-Object -First 1"
+    controller._command_executor.run_script.return_value = CommandResult(
         output="Test Output",
         error="",
         success=True,
-        command="Get-Process | Select-Object -First 1",
+        command=script,
         execution_time=0.1,
     )
-    controller._command_executor.run_script = AsyncMock(return_value=expected_result)
-    await controller.start()
 
-    try:
-        script = "Get-Process | Select-Object -First 1"
-        result = await controller.run_script(script)
-        assert isinstance(result, CommandResultProtocol)
-        assert result.success
-        assert result.output == "Test Output"
-        assert result.error == ""
-        assert result.command == script
-        assert result.execution_time > 0
-    finally:
-        await controller.close()
-        assert controller._session is None
+    result = await controller.run_script(script)
+    assert isinstance(result, CommandResultProtocol)
+    assert result.success
+    assert result.output == "Test Output"
+    assert result.error == ""
+    assert result.command == script
+    assert result.execution_time > 0
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
-async def test_get_json():
+async def test_get_json(controller):
     """JSON取得のテスト"""
-    controller = PowerShellController()
-    controller._session = AsyncMock()
-    execute_mock = AsyncMock(return_value='{"name": "test", "value": 123}')
-    controller._session.execute = execute_mock
-    controller._session.stop = AsyncMock()
-    await controller.start()
+    controller._session.execute.return_value = _JSON_STR
 
-    try:
-        result = await controller.get_json("Get-Process | Select-Object -First 1 | ConvertTo-Json")
-        assert isinstance(result, dict)
-        assert result["name"] == "test"
-        assert result["value"] == 123
-        execute_mock.assert_awaited_once_with(
-            "Get-Process | Select-Object -First 1 | ConvertTo-Json", None
-        )
-    finally:
-        await controller.close()
-        assert controller._session is None
+    result = await controller.get_json("Get-Process | Select-Object -First 1 | ConvertTo-Json")
+    assert result == _JSON_OBJ
+    controller._session.execute.assert_awaited_once_with(
+        "Get-Process | Select-Object -First 1 | ConvertTo-Json", None
+    )
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_close():
     """closeメソッドのテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock()
+    controller._session = _make_session_mock()
     await controller.start()
     await controller.close()
     assert controller._session is None
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_close_error():
     """closeメソッドのエラーテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock(side_effect=PowerShellShutdownError("Test Error"))
+    controller._session = _make_session_mock()
+    controller._session.stop.side_effect = PowerShellShutdownError("Test Error")
     await controller.start()
     with pytest.raises(PowerShellShutdownError):
         await controller.close()
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_close_sync():
     """close_syncメソッドのテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock()
+    controller._session = _make_session_mock()
 
-    # イベントループの実行をモック
-    mock_loop = MagicMock()
-    mock_loop.is_running.return_value = False
-    mock_loop.run_until_complete = MagicMock()
+    # イベントループの実行をスタブ化
+    stub_loop = _StubLoop()
 
-    with patch("asyncio.get_event_loop", return_value=mock_loop):
+    with patch("asyncio.get_event_loop", return_value=stub_loop):
         controller.close_sync()
         assert controller._session is None
-        mock_loop.run_until_complete.assert_called_once()
+        assert stub_loop.calls == 1
 
 
 @pytest.mark.asyncio
-@pytest.mark.timeout(10)
 async def test_close_sync_error():
     """close_syncメソッドのエラーテスト"""
     controller = PowerShellController()
-    controller._session = AsyncMock()
-    controller._session.stop = AsyncMock(side_effect=PowerShellShutdownError("Test Error"))
+    controller._session = _make_session_mock()
+    controller._session.stop.side_effect = PowerShellShutdownError("Test Error")
 
-    # イベントループの実行をモック
-    mock_loop = MagicMock()
-    mock_loop.is_running.return_value = False
-    mock_loop.run_until_complete = MagicMock(side_effect=PowerShellShutdownError("Test Error"))
+    # イベントループの実行をスタブ化
+    stub_loop = _StubLoop(error=PowerShellShutdownError("Test Error"))
 
-    with patch("asyncio.get_event_loop", return_value=mock_loop):
+    with patch("asyncio.get_event_loop", return_value=stub_loop):
         with pytest.raises(PowerShellShutdownError):
             controller.close_sync()
         assert controller._session is None  # エラーが発生してもセッションはクリーンアップされる
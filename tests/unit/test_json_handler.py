@@ -21,10 +21,7 @@ class TestJsonHandler:
         result = JsonHandler.get_json(command, json_data)
 
         # 正しくパースされたか
-        assert isinstance(result, dict)
-        assert result["name"] == "test"
-        assert result["value"] == 123
-        assert result["items"] == [1, 2, 3]
+        assert result == {"name": "test", "value": 123, "items": [1, 2, 3]}
 
     def test_get_json_invalid_json(self):
         """無効なJSONのパースをテスト（例外発生）"""
@@ -58,6 +55,15 @@ class TestJsonHandler:
         # コマンドが変更されていないか
         assert result == command
 
+    def test_ensure_json_command_with_json_lowercase(self):
+        """小文字のconvertto-jsonが含まれているコマンドのテスト"""
+        command = "Get-Process | convertto-json"
+
+        result = JsonHandler.ensure_json_command(command)
+
+        # 大文字小文字に関係なくConvertTo-Jsonが二重に追加されないか
+        assert result == command
+
     def test_parse_json_valid_dict(self):
         """有効な辞書JSONのパースをテスト"""
         json_data = '{"name": "test", "value": 123}'
@@ -66,9 +72,7 @@ class TestJsonHandler:
         result = JsonHandler.parse_json(command, json_data)
 
         # 正しくパースされたか
-        assert isinstance(result, dict)
-        assert result["name"] == "test"
-        assert result["value"] == 123
+        assert result == {"name": "test", "value": 123}
 
     def test_parse_json_not_dict(self):
         """辞書でないJSONのパースをテスト（例外発生）"""
@@ -5,12 +5,10 @@ ProcessManagerクラスの機能テスト
 """
 
 import asyncio
-import sys
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from py_pshell.config import PowerShellControllerSettings
 from py_pshell.errors import PowerShellShutdownError, PowerShellStartupError
 from py_pshell.process_manager import ProcessManager
 
@@ -18,65 +16,63 @@ from py_pshell.process_manager import ProcessManager
 class TestProcessManager:
     """ProcessManagerクラスのテスト"""
 
-    @pytest.fixture
-    def settings(self):
-        """テスト用の設定"""
-        return PowerShellControllerSettings(
-            powershell_executable="powershell" if sys.platform.lower() == "win32" else "pwsh",
-            encoding="utf-8",
-            debug=True,
-        )
-
     @pytest.fixture
     def process_manager(self, settings):
         """テスト用のProcessManager"""
         return ProcessManager(settings)
 
-    @pytest.mark.asyncio
-    async def test_start(self, process_manager):
-        """プロセス作成のテスト"""
-        # モックプロセスとストリームを作成
-        mock_process = MagicMock()
-        mock_process.pid = 12345
-        mock_process.stdout = MagicMock()
-        mock_process.stdin = MagicMock()
-
-        mock_reader = MagicMock(spec=asyncio.StreamReader)
-        mock_writer = MagicMock(spec=asyncio.StreamWriter)
-
-        # startメソッド内で呼び出される関数をモック
-        with patch("asyncio.create_subprocess_exec", return_value=mock_process), patch(
-            "asyncio.get_running_loop"
-        ), patch("asyncio.StreamReader", return_value=mock_reader), patch(
-            "asyncio.StreamReaderProtocol"
-        ), patch(
-            "asyncio.StreamWriter", return_value=mock_writer
-        ), patch(
-            "asyncio.wait_for", return_value=mock_process
+    @pytest.fixture
+    def mock_process(self):
+        """起動されるPowerShellプロセスのモック"""
+        process = MagicMock()
+        process.pid = 12345
+        return process
+
+    @pytest.fixture
+    def patched_subprocess(self, mock_process):
+        """プロセスの起動とパイプの接続をモック化する"""
+        loop = MagicMock()
+        loop.connect_read_pipe = AsyncMock()
+        with (
+            patch("asyncio.create_subprocess_exec", AsyncMock(return_value=mock_process)),
+            patch("asyncio.get_running_loop", return_value=loop),
+            patch("asyncio.StreamReaderProtocol"),
         ):
+            yield mock_process
 
-            # プロセスを起動
-            reader, writer = await process_manager.start()
+    @pytest.mark.asyncio
+    async def test_start(self, process_manager, patched_subprocess):
+        """プロセス作成のテスト"""
+        # プロセスを起動
+        reader, writer = await process_manager.start()
 
-            # プロセスとストリームが設定されたか確認
-            assert process_manager._process == mock_process
-            assert reader == mock_reader
-            assert writer == mock_writer
+        # プロセスとストリームが設定されたか確認
+        assert process_manager._process is patched_subprocess
+        assert isinstance(reader, asyncio.StreamReader)
+        assert isinstance(writer, asyncio.StreamWriter)
+        assert process_manager._reader is reader
+        assert process_manager._writer is writer
 
     @pytest.mark.asyncio
-    async def test_start_error(self, process_manager):
+    async def test_start_error(self, process_manager, retry_config):
         """プロセス作成エラーのテスト"""
+        # リトライされることを確認するため、最小限の回数と待機時間を設定
+        retry_config(max_attempts=2, delay=0.01)
 
         # タイムアウトエラーをシミュレート
-        async def mock_wait_for(*args, **kwargs):
+        async def mock_wait_for(coro, *args, **kwargs):
+            coro.close()
             raise TimeoutError("プロセスの起動がタイムアウトしました")
 
         # 例外が発生するようにモック
-        with patch("asyncio.wait_for", side_effect=mock_wait_for):
+        with patch("asyncio.wait_for", side_effect=mock_wait_for) as wait_for_mock:
             # エラーが発生するか確認
             with pytest.raises(PowerShellStartupError):
                 await process_manager.start()
 
+            # 起動がリトライされたか確認
+            assert wait_for_mock.call_count == 2
+
     @pytest.mark.asyncio
     async def test_stop(self, process_manager):
         """プロセス終了のテスト"""
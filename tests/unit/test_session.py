@@ -0,0 +1,49 @@
+"""
+PowerShellSessionのテスト
+
+PowerShellSessionクラスの機能テスト
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from py_pshell.process_manager import ProcessManager
+from py_pshell.session import BASELINE_VARIABLES_COMMAND, RESET_STATE_COMMAND, PowerShellSession
+from py_pshell.stream_handler import StreamHandler
+
+
+class TestPowerShellSession:
+    """PowerShellSessionクラスのテスト"""
+
+    @pytest.fixture
+    def session(self, settings):
+        """プロセスとストリームをモック化したPowerShellSession"""
+        session = PowerShellSession(settings)
+        session._process_manager = AsyncMock(spec_set=ProcessManager)
+        session._process_manager.start.return_value = (MagicMock(), MagicMock())
+        session._stream_handler = AsyncMock(spec_set=StreamHandler)
+        session._stream_handler.set_streams = MagicMock()
+        session._stream_handler.execute_command.return_value = ""
+        return session
+
+    @pytest.mark.asyncio
+    async def test_start_records_baseline_variables(self, session):
+        """開始時に初期化後の変数一覧が記録されるかのテスト"""
+        await session.start()
+
+        session._stream_handler.initialize.assert_awaited_once()
+        session._stream_handler.execute_command.assert_awaited_once_with(BASELINE_VARIABLES_COMMAND)
+
+    @pytest.mark.asyncio
+    async def test_reset_state(self, session):
+        """状態リセットで送信されるコマンドのテスト"""
+        await session.start()
+        session._stream_handler.execute_command.reset_mock()
+
+        await session.reset_state()
+
+        session._stream_handler.execute_command.assert_awaited_once_with(RESET_STATE_COMMAND, None)
+        # 自動変数や設定変数まで削除するワイルドカード指定は使わない
+        assert "Remove-Variable *" not in RESET_STATE_COMMAND
+        assert "$global:__PSBaselineVariables -notcontains" in RESET_STATE_COMMAND
@@ -5,113 +5,213 @@ StreamHandlerクラスの機能テスト
 """
 
 import asyncio
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock
 
 import pytest
 
-from py_pshell.config import PowerShellControllerSettings, PowerShellTimeoutSettings
-from py_pshell.errors import PowerShellExecutionError
-from py_pshell.stream_handler import StreamHandler
+from py_pshell.errors import PowerShellExecutionError, PowerShellTimeoutError
+from py_pshell.stream_handler import (
+    COMMAND_ERROR_MARKER,
+    COMMAND_SUCCESS_MARKER,
+    ENCODING_INIT_SCRIPT,
+    OUTPUT_END_COMMAND,
+    OUTPUT_END_MARKER,
+    StreamHandler,
+)
 
+# 日本語の出力テスト用データ（エンコードはインポート時に1回だけ行う）
+JAPANESE_HELLO = "こんにちは"
+JAPANESE_WORLD = "世界"
+JAPANESE_CHUNKS_SJIS = (JAPANESE_HELLO.encode("shift-jis"), JAPANESE_WORLD.encode("shift-jis"))
 
-class TestStreamHandler:
-    """StreamHandlerクラスのテスト"""
 
-    @pytest.fixture
-    def mock_reader(self):
-        """モックの標準出力ストリーム"""
-        reader = AsyncMock(spec=asyncio.StreamReader)
+class FakeReader:
+    """標準出力ストリームのスタブ
+
+    設定されたチャンクを先頭から1つずつ返し、なくなるとストリーム終了（b""）を返します。
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: list[bytes] | None = None) -> None:
+        self.chunks = list(chunks or [])
+
+    async def read(self, n: int = -1) -> bytes:
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+class LateReader(FakeReader):
+    """出力が遅れて届く標準出力ストリームのスタブ
+
+    releasedがセットされるまでチャンクを返しません。
+    """
+
+    __slots__ = ("released",)
+
+    def __init__(self, chunks: list[bytes] | None = None) -> None:
+        super().__init__(chunks)
+        self.released = asyncio.Event()
+
+    async def read(self, n: int = -1) -> bytes:
+        await self.released.wait()
+        return await super().read(n)
+
+
+class FakeWriter:
+    """標準入力ストリームのスタブ
+
+    書き込まれたデータと呼び出し回数を記録します。
+    """
+
+    __slots__ = ("writes", "drained", "closed", "wait_closed_calls")
 
-        # 注意: AsyncMockはデフォルトで非同期コルーチンを返すので、
-        # サイドエフェクトには直接bytesオブジェクトではなく、
-        # コルーチンをシミュレートするためにbytesを返す関数を設定する
-        async def read_side_effect(*args, **kwargs):
-            result = reader._mock_data.pop(0)
-            return result
+    def __init__(self) -> None:
+        self.writes: list[bytes] = []
+        self.drained = 0
+        self.closed = False
+        self.wait_closed_calls = 0
 
-        reader.read = AsyncMock(side_effect=read_side_effect)
-        reader._mock_data = []  # テスト時にこのリストにデータを設定する
-        return reader
+    def write(self, data: bytes) -> None:
+        self.writes.append(data)
+
+    async def drain(self) -> None:
+        self.drained += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+    async def wait_closed(self) -> None:
+        self.wait_closed_calls += 1
+
+
+class TestStreamHandler:
+    """StreamHandlerクラスのテスト"""
 
     @pytest.fixture
-    def mock_writer(self):
-        """モックの標準入力ストリーム"""
-        writer = AsyncMock(spec=asyncio.StreamWriter)
-        writer.write = MagicMock()  # 非同期でない関数
-        writer.drain = AsyncMock()
-        writer.close = MagicMock()  # 非同期でない関数
-        writer.wait_closed = AsyncMock()
-        return writer
+    def reader(self):
+        """標準出力ストリームのスタブ（テスト時にchunksへデータを設定する）"""
+        return FakeReader()
 
     @pytest.fixture
-    def settings(self):
-        """テスト用の設定"""
-        settings = PowerShellControllerSettings(
-            powershell_executable="powershell",
-            encoding="utf-8",
-            debug=True,
-            timeout_settings=PowerShellTimeoutSettings(default=30.0),
-        )
-        return settings
+    def writer(self):
+        """標準入力ストリームのスタブ"""
+        return FakeWriter()
 
     @pytest.fixture
-    def stream_handler(self, settings, mock_reader, mock_writer):
+    def stream_handler(self, settings, reader, writer):
         """テスト用のStreamHandler"""
         handler = StreamHandler(settings)
-        handler.set_streams(mock_reader, mock_writer)
-        # タイムアウト設定の参照を修正するためにモンキーパッチを適用
-        with patch.object(handler, "settings") as mock_settings:
-            mock_settings.timeout_settings.default = 30.0
-            mock_settings.encoding = settings.encoding
-            yield handler
+        handler.set_streams(reader, writer)
+        return handler
 
     @pytest.mark.asyncio
-    async def test_initialize(self, stream_handler, mock_writer):
+    async def test_initialize(self, stream_handler, writer):
         """初期化処理のテスト"""
-        # モックの準備
-        mock_writer.write.reset_mock()
-        mock_writer.drain.reset_mock()
-
         # 初期化を実行
         await stream_handler.initialize()
 
-        # 初期化コマンドが送信されたことを確認
-        mock_writer.write.assert_called()
-        mock_writer.drain.assert_called()
+        # 初期化スクリプトが1回で送信されたことを確認
+        assert writer.writes == [ENCODING_INIT_SCRIPT.encode()]
+        assert writer.drained
 
     @pytest.mark.asyncio
-    async def test_send_command(self, stream_handler, mock_writer):
+    async def test_send_command(self, stream_handler, writer):
         """コマンド送信のテスト"""
         command = "Get-Process"
 
         # コマンドを送信
         await stream_handler.send_command(command)
 
-        # コマンドが正しく書き込まれたか確認
-        mock_writer.write.assert_called()
-        mock_writer.drain.assert_called()
+        # コマンドと終了マーカーの出力コマンドが1回で書き込まれたか確認
+        assert writer.writes == [f"{command}\n{OUTPUT_END_COMMAND}\n".encode()]
+        assert writer.drained
 
     @pytest.mark.asyncio
-    async def test_read_output(self, stream_handler, mock_reader):
+    async def test_read_output(self, stream_handler, reader):
         """出力読み取りのテスト"""
-        # モックの設定
-        mock_reader._mock_data = [
-            b"Process1",
-            b"Process2",
-            b"Done",
-            b"",  # ストリーム終了
+        reader.chunks = [b"Process1", b"Process2", b"Done"]
+
+        # 出力を読み取り
+        output = await stream_handler.read_output()
+
+        # 出力が正しく結合されているか確認
+        assert "Process1Process2Done" in output
+
+    @pytest.mark.asyncio
+    async def test_read_output_stops_at_end_marker(self, stream_handler, reader):
+        """終了マーカーで読み取りが終了するかのテスト"""
+        # マーカーがチャンクの境界をまたぐ場合も検出される
+        reader.chunks = [
+            b"Process1\nDone\n" + OUTPUT_END_MARKER[:5].encode(),
+            OUTPUT_END_MARKER[5:].encode() + b"\n",
+            b"Unread",
         ]
 
-        # wait_forをパッチしてasyncio.wait_forの動作をシミュレート
-        async def mock_wait_for(coro, timeout):
-            return await coro
+        output = await stream_handler.read_output()
 
-        # 出力を読み取り
-        with patch("asyncio.wait_for", side_effect=mock_wait_for):
-            output = await stream_handler.read_output()
+        assert output == "Process1\nDone\n"
+        # マーカー以降は読み取らない
+        assert reader.chunks == [b"Unread"]
+
+    @pytest.mark.asyncio
+    async def test_read_output_multibyte_split_across_chunks(self, stream_handler, reader):
+        """チャンクの境界で分割されたマルチバイト文字の読み取りテスト"""
+        encoded = JAPANESE_HELLO.encode("utf-8")
+        # 1文字目（3バイト）の途中で分割する
+        reader.chunks = [encoded[:1], encoded[1:]]
+
+        output = await stream_handler.read_output()
 
-            # 出力が正しく結合されているか確認
-            assert "Process1Process2Done" in output
+        # 分割された文字が壊れずにデコードされたか確認
+        assert output == JAPANESE_HELLO
+
+    @pytest.mark.asyncio
+    async def test_read_output_replaces_undecodable_bytes(self, stream_handler, reader):
+        """デコードできないバイトが置換文字になるかのテスト"""
+        # UTF-8として不正なバイト（Shift-JISの「こんにちは」）を含む出力
+        reader.chunks = [b"before ", JAPANESE_CHUNKS_SJIS[0], b" after"]
+
+        output = await stream_handler.read_output()
+
+        # 例外にならず、不正なバイトだけが置換文字になる
+        assert output.startswith("before ")
+        assert output.endswith(" after")
+        assert "\ufffd" in output
+
+    @pytest.mark.asyncio
+    async def test_read_output_timeout_skips_late_output(self, settings, writer):
+        """タイムアウトしたコマンドの出力が次の読み取りに混入しないかのテスト"""
+        reader = LateReader(
+            [
+                f"Late\n{OUTPUT_END_MARKER}\nCur".encode(),
+                f"rent\n{OUTPUT_END_MARKER}\n".encode(),
+            ]
+        )
+        handler = StreamHandler(settings)
+        handler.set_streams(reader, writer)
+
+        # 期限切れは空の出力ではなく例外になる
+        with pytest.raises(PowerShellTimeoutError):
+            await handler.read_output(timeout=0.01)
+
+        # 期限切れのコマンドの出力が、次のコマンドの出力と一緒に遅れて届く
+        reader.released.set()
+        output = await handler.read_output()
+
+        # 遅れて届いた出力は読み飛ばされ、今回の出力だけが返る
+        assert output.strip() == "Current"
+        assert reader.chunks == []
+
+    @pytest.mark.asyncio
+    async def test_undecodable_output_does_not_break_later_commands(self, stream_handler, reader):
+        """デコードできない出力の後も、同じハンドラーで次のコマンドを実行できるかのテスト"""
+        end = f"\n{OUTPUT_END_MARKER}\n".encode()
+        # cp932の「あ」はUTF-8としてデコードできない
+        reader.chunks = [b"\x82\xa0" + end, b"one" + end, b"two" + end]
+
+        assert await stream_handler.execute_command("& native.exe") == "\ufffd\ufffd"
+        assert await stream_handler.execute_command("Write-Output 'one'") == "one"
+        assert await stream_handler.execute_command("Write-Output 'two'") == "two"
 
     @pytest.mark.asyncio
     async def test_execute_command_success(self, stream_handler):
@@ -124,13 +224,24 @@ class TestStreamHandler:
         stream_handler.read_output = AsyncMock(return_value=expected_output)
 
         # コマンド実行
-        with patch.object(stream_handler, "settings"):
-            output = await stream_handler.execute_command(command)
+        output = await stream_handler.execute_command(command)
 
-            # 出力が正しいか確認
-            assert output == expected_output
-            stream_handler.send_command.assert_called_once_with(command)
-            stream_handler.read_output.assert_called_once()
+        # 出力が正しいか確認
+        assert output == expected_output
+        stream_handler.send_command.assert_called_once_with(command)
+        stream_handler.read_output.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_execute_command_strips_success_marker(self, stream_handler):
+        """成功マーカー以降が除去されるかのテスト"""
+        stream_handler.send_command = AsyncMock()
+        stream_handler.read_output = AsyncMock(
+            return_value=f"Process1\nProcess2\n{COMMAND_SUCCESS_MARKER}\n"
+        )
+
+        output = await stream_handler.execute_command("Get-Process")
+
+        assert output == "Process1\nProcess2"
 
     @pytest.mark.asyncio
     async def test_execute_command_with_error(self, stream_handler):
@@ -139,10 +250,10 @@ class TestStreamHandler:
 
         # モックメソッドのパッチ
         stream_handler.send_command = AsyncMock()
-        stream_handler.read_output = AsyncMock(return_value="エラーCOMMAND_ERROR")
+        stream_handler.read_output = AsyncMock(return_value=f"エラー{COMMAND_ERROR_MARKER}")
 
-        # 例外が発生するか確認
-        with pytest.raises(PowerShellExecutionError):
+        # 例外が発生し、マーカーより前のエラー内容がメッセージに含まれるか確認
+        with pytest.raises(PowerShellExecutionError, match="エラー"):
             await stream_handler.execute_command(command)
 
         # メソッドが正しく呼ばれたか確認
@@ -150,57 +261,40 @@ class TestStreamHandler:
         stream_handler.read_output.assert_called_once()
 
     @pytest.mark.asyncio
-    async def test_close(self, stream_handler, mock_writer):
+    async def test_execute_command_timeout(self, stream_handler):
+        """タイムアウトがそのまま伝わるかのテスト"""
+        stream_handler.send_command = AsyncMock()
+        stream_handler.read_output = AsyncMock(side_effect=PowerShellTimeoutError())
+
+        # PowerShellExecutionErrorに変換されない
+        with pytest.raises(PowerShellTimeoutError):
+            await stream_handler.execute_command("Start-Sleep -Seconds 5", timeout=1)
+
+        stream_handler.read_output.assert_called_once_with(1)
+
+    @pytest.mark.asyncio
+    async def test_close(self, stream_handler, writer):
         """ストリームクローズのテスト"""
         # ストリームを閉じる
         await stream_handler.close()
 
         # close()とwait_closed()が呼ばれたか確認
-        mock_writer.close.assert_called_once()
-        mock_writer.wait_closed.assert_called_once()
+        assert writer.closed
+        assert writer.wait_closed_calls == 1
 
     @pytest.mark.asyncio
-    async def test_handle_encoding_errors(self, settings):
+    async def test_handle_encoding_errors(self, settings, writer):
         """エンコーディングエラー処理のテスト"""
-        # UTF-8以外のエンコーディングを設定
-        settings.encoding = "shift-jis"
-
-        # モックリーダーの作成
-        mock_reader = AsyncMock(spec=asyncio.StreamReader)
-
-        # 読み取りメソッドをオーバーライド
-        async def read_side_effect(*args, **kwargs):
-            result = mock_reader._mock_data.pop(0)
-            return result
-
-        mock_reader.read = AsyncMock(side_effect=read_side_effect)
-        mock_reader._mock_data = [
-            "こんにちは".encode("shift-jis"),
-            "世界".encode("shift-jis"),
-            b"",  # ストリーム終了
-        ]
-
-        mock_writer = AsyncMock(spec=asyncio.StreamWriter)
-        mock_writer.write = MagicMock()
-        mock_writer.drain = AsyncMock()
+        # UTF-8以外のエンコーディングを設定（共有の設定は変更しない）
+        settings = settings.model_copy(update={"encoding": "shift-jis"})
 
         # StreamHandlerを作成
         handler = StreamHandler(settings)
-        handler.set_streams(mock_reader, mock_writer)
-
-        # asyncio.wait_forをモック
-        async def mock_wait_for(coro, timeout):
-            return await coro
+        handler.set_streams(FakeReader(list(JAPANESE_CHUNKS_SJIS)), writer)
 
         # 出力を読み取り
-        with patch("asyncio.wait_for", side_effect=mock_wait_for), patch.object(
-            handler, "settings"
-        ) as mock_settings:
-            mock_settings.timeout_settings.default = 30.0
-            mock_settings.encoding = "shift-jis"
-
-            output = await handler.read_output()
+        output = await handler.read_output()
 
-            # 日本語が正しく処理されたか確認
-            assert "こんにちは" in output
-            assert "世界" in output
+        # 日本語が正しく処理されたか確認
+        assert JAPANESE_HELLO in output
+        assert JAPANESE_WORLD in output
@@ -5,8 +5,9 @@ PowerShellコントローラーのテスト用ユーティリティ
 """
 
 import os
-import platform
 import tempfile
+from collections import deque
+from pathlib import Path
 from typing import Any
 
 import pytest
@@ -16,10 +17,6 @@ from py_pshell.errors import PowerShellExecutionError
 from py_pshell.interfaces import CommandResultProtocol, PowerShellControllerProtocol
 from py_pshell.utils.command_result import CommandResult
 
-# テスト環境の情報
-IS_WINDOWS = platform.system().lower() == "windows"
-IS_CI = "CI" in os.environ
-
 
 class MockCommandResult(CommandResult):
     """
@@ -32,6 +29,10 @@ class MockCommandResult(CommandResult):
         )
 
 
+# MockPowerShellControllerが保持する実行履歴の最大件数
+EXECUTED_COMMANDS_MAXLEN = 10_000
+
+
 class MockPowerShellController(PowerShellControllerProtocol):
     """
     モックPowerShellコントローラー
@@ -56,9 +57,25 @@ class MockPowerShellController(PowerShellControllerProtocol):
         self.command_responses = command_responses or {}
         self.default_response = default_response
         self.raise_on_unknown = raise_on_unknown
-        self.executed_commands: list[str] = []
+        # 長時間共有されても履歴が増え続けないよう、直近の実行履歴のみ保持する
+        self.executed_commands: deque[str] = deque(maxlen=EXECUTED_COMMANDS_MAXLEN)
         self.closed = False
 
+    @property
+    def last_command(self) -> str | None:
+        """
+        最後に実行されたコマンドを返します（未実行の場合はNone）
+        """
+        return self.executed_commands[-1] if self.executed_commands else None
+
+    async def execute_commands_in_session(
+        self, commands: list[str], timeout: float | None = None
+    ) -> list[str]:
+        """
+        複数のコマンドをまとめて実行します（モック）
+        """
+        return [self.execute_command(command, timeout) for command in commands]
+
     async def run_command(
         self, command: str, timeout: float | None = None
     ) -> CommandResultProtocol:
@@ -153,22 +170,42 @@ class MockPowerShellController(PowerShellControllerProtocol):
             )
 
 
-def create_powershell_script(content: str) -> str:
+# temp_scriptで使用するスクリプト（バイト列で定義し、作成時のエンコードを省く）
+_TEMP_SCRIPT_CONTENT: bytes = b"""
+    param (
+        [string]$Name = "Default",
+        [int]$Value = 0
+    )
+    
+    $output = @{
+        Name = $Name
+        Value = $Value
+        Date = Get-Date -Format "yyyy-MM-dd"
+    }
+    
+    $output | ConvertTo-Json
+    """
+
+
+def create_powershell_script(
+    content: str | bytes, directory: str | os.PathLike | None = None
+) -> str:
     """
     テスト用のPowerShellスクリプトファイルを作成します。
 
     Args:
-        content: スクリプトの内容
+        content: スクリプトの内容（bytesの場合はエンコード済みとしてそのまま書き込む）
+        directory: 作成先のディレクトリ（省略時はシステムの一時ディレクトリ）
 
     Returns:
         str: 作成されたスクリプトファイルのパス
     """
-    fd, path = tempfile.mkstemp(suffix=".ps1", prefix="test_script_", text=True)
-    try:
-        os.write(fd, content.encode("utf-8"))
-    finally:
-        os.close(fd)
-    return path
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    with tempfile.NamedTemporaryFile(
+        suffix=".ps1", prefix="test_script_", dir=directory, delete=False
+    ) as script_file:
+        script_file.write(data)
+    return script_file.name
 
 
 def cleanup_temp_file(path: str) -> None:
@@ -179,50 +216,89 @@ def cleanup_temp_file(path: str) -> None:
         path: 削除するファイルのパス
     """
     try:
-        if os.path.exists(path):
-            os.unlink(path)
-    except Exception as e:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
         logger.warning(f"一時ファイルの削除に失敗しました: {e}")
 
 
-@pytest.fixture
-def mock_controller():
-    """
-    モックPowerShellコントローラーを提供するフィクスチャ
-    """
-    return MockPowerShellController(
-        command_responses={
-            "Get-Process": "Process1\nProcess2\nProcess3",
-            "Get-Date": "2023-01-01",
-            "Get-Error": PowerShellExecutionError("エラーが発生しました", "Get-Error"),
-            "Get-Process | ConvertTo-Json": (
-                '[{"Name": "Process1", "Id": 123}, ' '{"Name": "Process2", "Id": 456}]'
-            ),
-        },
-        default_response="Default Response",
-    )
+@pytest.mark.asyncio
+async def test_mock_controller_records_commands(mock_controller):
+    """実行履歴と最後のコマンドの記録テスト"""
+    assert mock_controller.last_command is None
 
+    result = await mock_controller.run_command("Get-Process")
+    assert result.output == "Process1\nProcess2\nProcess3"
+    assert mock_controller.execute_command("Get-Date") == "2023-01-01"
+
+    assert list(mock_controller.executed_commands) == ["Get-Process", "Get-Date"]
+    assert mock_controller.last_command == "Get-Date"
+
+    await mock_controller.close()
+    assert mock_controller.closed
+
+
+def test_mock_controller_is_reset_between_tests(mock_controller):
+    """共有インスタンスの履歴と終了状態がテストごとにリセットされるかのテスト"""
+    # 直前のテストで実行したコマンドと終了状態は残っていない
+    assert mock_controller.last_command is None
+    assert not mock_controller.closed
+
+
+def test_mock_controller_responses(mock_controller):
+    """登録された応答とデフォルト応答のテスト"""
+    assert mock_controller.execute_command("Unknown-Command") == "Default Response"
+    assert mock_controller.get_json("Get-Process | ConvertTo-Json")[1]["Id"] == 456
+    with pytest.raises(PowerShellExecutionError, match="エラーが発生しました"):
+        mock_controller.execute_command("Get-Error")
+
+
+@pytest.mark.asyncio
+async def test_mock_controller_execute_commands_in_session(mock_controller):
+    """複数コマンドの一括実行のテスト（コマンドごとの出力を返す）"""
+    results = await mock_controller.execute_commands_in_session(["Get-Process", "Get-Date"])
+
+    assert results == ["Process1\nProcess2\nProcess3", "2023-01-01"]
+    assert list(mock_controller.executed_commands) == ["Get-Process", "Get-Date"]
+
+    with pytest.raises(PowerShellExecutionError, match="エラーが発生しました"):
+        await mock_controller.execute_commands_in_session(["Get-Date", "Get-Error"])
+
+
+def test_mock_controller_history_is_bounded():
+    """実行履歴が最大件数で打ち切られるかのテスト"""
+    controller = MockPowerShellController()
+    for i in range(EXECUTED_COMMANDS_MAXLEN + 1):
+        controller.execute_command(f"Command-{i}")
+
+    # 最も古いコマンドが破棄され、直近の履歴だけが残る
+    assert len(controller.executed_commands) == EXECUTED_COMMANDS_MAXLEN
+    assert controller.executed_commands[0] == "Command-1"
+    assert controller.last_command == f"Command-{EXECUTED_COMMANDS_MAXLEN}"
+
+
+@pytest.mark.parametrize(
+    "content", ["Write-Output 'こんにちは'", "Write-Output 'こんにちは'".encode()]
+)
+def test_create_powershell_script(tmp_path, content):
+    """文字列とバイト列のどちらからもスクリプトを作成できるかのテスト"""
+    path = create_powershell_script(content, directory=tmp_path)
+
+    assert path.endswith(".ps1")
+    assert Path(path).parent == tmp_path
+    assert Path(path).read_text(encoding="utf-8") == "Write-Output 'こんにちは'"
+
+
+def test_cleanup_temp_file(tmp_path):
+    """一時ファイルの削除テスト（存在しないファイルでもエラーにならない）"""
+    path = create_powershell_script("Write-Output 'Test'", directory=tmp_path)
+
+    cleanup_temp_file(path)
+    assert not Path(path).exists()
+
+    # 2回目の削除は何もしない
+    cleanup_temp_file(path)
 
-@pytest.fixture
-def temp_script():
-    """
-    テスト用の一時スクリプトファイルを提供するフィクスチャ
-    """
-    script_content = """
-    param (
-        [string]$Name = "Default",
-        [int]$Value = 0
-    )
-    
-    $output = @{
-        Name = $Name
-        Value = $Value
-        Date = Get-Date -Format "yyyy-MM-dd"
-    }
-    
-    $output | ConvertTo-Json
-    """
 
-    script_path = create_powershell_script(script_content)
-    yield script_path
-    cleanup_temp_file(script_path)
+def test_temp_script(temp_script):
+    """共有の一時スクリプトの内容テスト"""
+    assert Path(temp_script).read_bytes() == _TEMP_SCRIPT_CONTENT